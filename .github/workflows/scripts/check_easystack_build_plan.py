@@ -0,0 +1,100 @@
+"""
+Check the build plans created by easystack_build_plan.py for accelerator targets, using a small synthetic
+checkout of easystacks and easyconfigs:
+
+    python3 .github/workflows/scripts/check_easystack_build_plan.py
+"""
+import os
+import sys
+import tempfile
+
+from easystack_build_plan import cpu_target, make_build_plan
+
+VERSION = '9999.01'
+
+EASYCONFIGS = {
+    'GCCcore-12.3.0.eb': "name = 'GCCcore'\nversion = '12.3.0'\ntoolchain = SYSTEM\n",
+    'GCC-12.3.0.eb': "name = 'GCC'\nversion = '12.3.0'\ntoolchain = SYSTEM\ndependencies = [('GCCcore', version)]\n",
+    'CUDA-12.1.1.eb': "name = 'CUDA'\nversion = '12.1.1'\ntoolchain = SYSTEM\n",
+    'zlib-1.2.13-GCCcore-12.3.0.eb': "name = 'zlib'\nversion = '1.2.13'\n"
+                                     "toolchain = {'name': 'GCCcore', 'version': '12.3.0'}\n",
+    'SciPy-1-GCC-12.3.0.eb': "name = 'SciPy'\nversion = '1'\ntoolchain = {'name': 'GCC', 'version': '12.3.0'}\n",
+    'CUDA-Samples-12.1-GCC-12.3.0-CUDA-12.1.1.eb': "name = 'CUDA-Samples'\nversion = '12.1'\n"
+                                                   "versionsuffix = '-CUDA-12.1.1'\n"
+                                                   "toolchain = {'name': 'GCC', 'version': '12.3.0'}\n"
+                                                   "dependencies = [('CUDA', '12.1.1', '', SYSTEM)]\n",
+    'Tool-1-GCC-12.3.0-CUDA-12.1.1.eb': "name = 'Tool'\nversion = '1'\nversionsuffix = '-CUDA-12.1.1'\n"
+                                        "toolchain = {'name': 'GCC', 'version': '12.3.0'}\n"
+                                        "dependencies = [('zlib', '1.2.13'), ('CUDA', '12.1.1', '', SYSTEM)]\n",
+}
+
+# easystack files per target directory, GPU builds are also listed for generic (like in 2023.06)
+EASYSTACKS = {
+    '': ['SciPy-1-GCC-12.3.0.eb', 'CUDA-Samples-12.1-GCC-12.3.0-CUDA-12.1.1.eb'],
+    'zen4': ['zlib-1.2.13-GCCcore-12.3.0.eb'],
+    'accel/nvidia': ['SciPy-1-GCC-12.3.0.eb', 'CUDA-Samples-12.1-GCC-12.3.0-CUDA-12.1.1.eb'],
+    'accel/nvidia/zen4_h100': ['Tool-1-GCC-12.3.0-CUDA-12.1.1.eb'],
+}
+
+
+def create_checkout(path):
+    """Create synthetic easyconfigs and easystacks directories in path, and return their locations."""
+    easyconfigs_dir = os.path.join(path, 'easyconfigs')
+    os.makedirs(easyconfigs_dir)
+    for filename, contents in EASYCONFIGS.items():
+        with open(os.path.join(easyconfigs_dir, filename), 'w') as fp:
+            fp.write(contents)
+
+    easystacks_dir = os.path.join(path, 'easystacks')
+    for target, easyconfigs in EASYSTACKS.items():
+        target_dir = os.path.join(easystacks_dir, VERSION, target)
+        os.makedirs(target_dir, exist_ok=True)
+        with open(os.path.join(target_dir, f"eessi-{VERSION}-eb-5.0.0-2023a.yml"), 'w') as fp:
+            fp.write('easyconfigs:\n' + ''.join(f"  - {ec}\n" for ec in easyconfigs))
+
+    return easyconfigs_dir, easystacks_dir
+
+
+def check_cpu_target(plan):
+    for target, expected in [('zen4', None), ('accel/nvidia', ''), ('grace/accel/nvidia', 'grace'),
+                             ('accel/nvidia/zen4_h100', 'zen4')]:
+        assert cpu_target(target) == expected, f"expected CPU target {expected!r} for {target}, got {cpu_target(target)!r}"
+
+
+def check_accel_roots_in_plan(plan):
+    accel_plan = plan['targets']['accel/nvidia']
+    # easyconfigs listed for the accelerator target stay in its plan, even if they are also listed for generic
+    for easyconfig in EASYSTACKS['accel/nvidia']:
+        assert easyconfig in accel_plan['nodes'], f"{easyconfig} missing from accel/nvidia plan"
+    assert 'GCC-12.3.0.eb' in accel_plan['external'], "GCC should be provided by the generic plan"
+    assert 'GCC-12.3.0.eb' not in accel_plan['nodes'], "GCC should not be built for accel/nvidia"
+    assert accel_plan['issues']['complete'], f"unexpected issues: {accel_plan['issues']}"
+
+
+def check_cpu_specific_accel_target(plan):
+    h100_plan = plan['targets']['accel/nvidia/zen4_h100']
+    assert 'Tool-1-GCC-12.3.0-CUDA-12.1.1.eb' in h100_plan['nodes'], "Tool missing from accel/nvidia/zen4_h100 plan"
+    # zlib is only listed in the zen4 easystacks, which provide the CPU dependencies for zen4_h100
+    assert 'zlib-1.2.13-GCCcore-12.3.0.eb' in h100_plan['external'], \
+        "zlib should be provided by the zen4 plan for accel/nvidia/zen4_h100"
+
+
+def main():
+    failed = False
+    with tempfile.TemporaryDirectory() as tmpdir:
+        easyconfigs_dir, easystacks_dir = create_checkout(tmpdir)
+        plan = make_build_plan(VERSION, easyconfigs_dir, easystacks_dir=easystacks_dir)
+
+        for check in (check_cpu_target, check_accel_roots_in_plan, check_cpu_specific_accel_target):
+            try:
+                check(plan)
+                print(f"{check.__name__}: OK")
+            except AssertionError as err:
+                print(f"{check.__name__}: FAILED ({err})")
+                failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""
+Find duplicate and redundant entries across all easystack files for a version of EESSI.
+
+Each entry is normalized (with or without .eb suffix) and grouped by effective build target,
+which is determined by the directory of the easystack file relative to
+easystacks/software.eessi.io/<version> (e.g. '' for generic CPU targets, 'zen4', 'accel/nvidia',
+'grace/accel/nvidia'). Easystack files in a 'rebuilds' directory are intentional rebuilds,
+and are ignored unless --include-rebuilds is used.
+
+Types of findings:
+ * exact: same easyconfig with same options listed more than once for the same target, with the same EasyBuild version;
+ * options: same easyconfig listed for the same target with the same EasyBuild version, but different options;
+ * superseded: same easyconfig listed for the same target with different EasyBuild versions,
+               all but the one for the latest EasyBuild version are superseded;
+ * cross_target: easyconfig listed both for a target and for a more specific CPU target (e.g. generic and zen4).
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+EASYSTACKS_DIR = os.path.join('easystacks', 'software.eessi.io')
+REBUILDS_DIR = 'rebuilds'
+
+FINDING_TYPES = ['exact', 'options', 'superseded', 'cross_target']
+
+EB_VERSION_REGEX = re.compile(r'eb-(\d+(?:\.\d+)+)')
+
+
+def normalize_easyconfig(name):
+    """
+    Normalize easyconfig name, so entries with and without .eb suffix match,
+    as well as entries that specify the path to an easyconfig file (like those in reprod directories).
+    """
+    name = os.path.basename(name.strip())
+    return name if name.endswith('.eb') else name + '.eb'
+
+
+def eb_version_from_filename(path):
+    """Extract EasyBuild version from easystack filename, as a tuple of integers (or None)."""
+    match = EB_VERSION_REGEX.search(os.path.basename(path))
+    if match:
+        return tuple(int(x) for x in match.group(1).split('.'))
+    return None
+
+
+def target_from_path(path, version_dir):
+    """
+    Determine (target, is_rebuild) for an easystack file, based on its location in the version directory.
+    """
+    parts = os.path.relpath(os.path.dirname(path), version_dir).split(os.sep)
+    parts = [part for part in parts if part not in ('', '.')]
+    is_rebuild = REBUILDS_DIR in parts
+    target = '/'.join(part for part in parts if part != REBUILDS_DIR)
+    return target, is_rebuild
+
+
+def parent_target(target):
+    """
+    Return less specific target that also covers the specified target, or None.
+
+    CPU specific targets are covered by the target without the CPU part: 'zen4' by generic,
+    'grace/accel/nvidia' and 'accel/nvidia/zen4_h100' by 'accel/nvidia'.
+    """
+    parts = target.split('/') if target else []
+    if 'accel' in parts:
+        idx = parts.index('accel')
+        accel_parts = parts[idx:idx + 2]
+        cpu_parts = parts[:idx] + parts[idx + 2:]
+    else:
+        accel_parts, cpu_parts = [], parts
+    if not cpu_parts:
+        return None
+    return '/'.join(accel_parts)
+
+
+def node_to_python(node):
+    """Convert YAML node to Python data; scalars are kept as strings, so options compare consistently."""
+    if isinstance(node, yaml.MappingNode):
+        return {node_to_python(key): node_to_python(value) for key, value in node.value}
+    if isinstance(node, yaml.SequenceNode):
+        return [node_to_python(item) for item in node.value]
+    return node.value
+
+
+def read_easystack(path, version_dir):
+    """Return list of entries in specified easystack file."""
+    with open(path) as fp:
+        root = yaml.compose(fp, Loader=SafeLoader)
+
+    target, is_rebuild = target_from_path(path, version_dir)
+    eb_version = eb_version_from_filename(path)
+
+    easyconfigs_node = None
+    if isinstance(root, yaml.MappingNode):
+        for key, value in root.value:
+            if key.value == 'easyconfigs' and isinstance(value, yaml.SequenceNode):
+                easyconfigs_node = value
+    if easyconfigs_node is None:
+        return []
+
+    entries = []
+    for item in easyconfigs_node.value:
+        options = {}
+        if isinstance(item, yaml.MappingNode):
+            name_node, value_node = item.value[0]
+            name = name_node.value
+            value = node_to_python(value_node)
+            if isinstance(value, dict):
+                options = value.get('options') or {}
+        else:
+            name = item.value
+        entries.append({
+            'easyconfig': normalize_easyconfig(name),
+            'name': name,
+            'options': options,
+            'file': path,
+            'line': item.start_mark.line + 1,
+            'target': target,
+            'rebuild': is_rebuild,
+            'eb_version': eb_version,
+        })
+
+    return entries
+
+
+def read_easystacks(version, easystacks_dir=EASYSTACKS_DIR, include_rebuilds=False):
+    """Return list of entries in all easystack files for specified EESSI version."""
+    version_dir = os.path.join(easystacks_dir, version)
+    if not os.path.isdir(version_dir):
+        raise FileNotFoundError(f"No easystacks directory for version {version}: {version_dir}")
+
+    entries = []
+    for path in sorted(glob.glob(os.path.join(version_dir, '**', '*.yml'), recursive=True)):
+        for entry in read_easystack(path, version_dir):
+            if include_rebuilds or not entry['rebuild']:
+                entries.append(entry)
+    return entries
+
+
+def options_key(options):
+    return json.dumps(options, sort_keys=True)
+
+
+def format_entry(entry):
+    return {
+        'name': entry['name'],
+        'file': entry['file'],
+        'line': entry['line'],
+        'eb_version': '.'.join(str(x) for x in entry['eb_version']) if entry['eb_version'] else None,
+        'options': entry['options'],
+    }
+
+
+def make_finding(finding_type, target, easyconfig, entries, **extra):
+    finding = {
+        'type': finding_type,
+        'target': target or 'generic',
+        'easyconfig': easyconfig,
+        'entries': [format_entry(entry) for entry in entries],
+    }
+    finding.update(extra)
+    return finding
+
+
+def find_duplicates(entries):
+    """Analyse list of easystack entries, and return list of findings."""
+    findings = []
+
+    by_target = defaultdict(list)
+    for entry in entries:
+        by_target[(entry['target'], entry['easyconfig'])].append(entry)
+
+    for (target, easyconfig), group in sorted(by_target.items()):
+        if len(group) > 1:
+            by_eb_version = defaultdict(list)
+            for entry in group:
+                by_eb_version[entry['eb_version'] or ()].append(entry)
+
+            if len(by_eb_version) > 1:
+                latest = max(by_eb_version)
+                superseded = [entry for eb_version, entries in sorted(by_eb_version.items()) if eb_version != latest
+                              for entry in entries]
+                findings.append(make_finding('superseded', target, easyconfig, superseded,
+                                             kept=[format_entry(entry) for entry in by_eb_version[latest]]))
+
+            for same_eb_version in by_eb_version.values():
+                if len(same_eb_version) < 2:
+                    continue
+                by_options = defaultdict(list)
+                for entry in same_eb_version:
+                    by_options[options_key(entry['options'])].append(entry)
+                for same_options in by_options.values():
+                    if len(same_options) > 1:
+                        findings.append(make_finding('exact', target, easyconfig, same_options))
+                if len(by_options) > 1:
+                    findings.append(make_finding('options', target, easyconfig, same_eb_version))
+
+    for (target, easyconfig), group in sorted(by_target.items()):
+        parent = parent_target(target)
+        if parent is not None and (parent, easyconfig) in by_target:
+            findings.append(make_finding('cross_target', target, easyconfig, group,
+                                         covered_by=[format_entry(entry) for entry in by_target[(parent, easyconfig)]]))
+
+    return findings
+
+
+def filter_findings(findings, files):
+    """Only retain findings that involve at least one of the specified easystack files."""
+    files = {os.path.normpath(path) for path in files}
+
+    def involved(entry_lists):
+        return any(os.path.normpath(entry['file']) in files for entries in entry_lists for entry in entries)
+
+    return [finding for finding in findings
+            if involved([finding['entries'], finding.get('kept', []), finding.get('covered_by', [])])]
+
+
+def finding_key(finding):
+    return finding['type'], finding['target'], finding['easyconfig']
+
+
+def finding_size(finding):
+    """Return total number of easystack entries involved in a finding."""
+    return sum(len(finding.get(key, [])) for key in ('entries', 'kept', 'covered_by'))
+
+
+def remove_known_findings(findings, baseline):
+    """
+    Remove findings that are also in the baseline report (e.g. for the target branch of a PR).
+
+    A finding is only known if it does not involve more entries than in the baseline,
+    so adding yet another copy of an easyconfig that was already listed twice is still reported.
+    Entry counts are compared rather than file locations, since those differ between checkouts.
+    """
+    known = {}
+    for finding in baseline['findings']:
+        key = finding_key(finding)
+        known[key] = max(known.get(key, 0), finding_size(finding))
+    return [finding for finding in findings if finding_size(finding) > known.get(finding_key(finding), 0)]
+
+
+def make_report(version, entries, findings):
+    summary = {finding_type: 0 for finding_type in FINDING_TYPES}
+    for finding in findings:
+        summary[finding['type']] += 1
+    return {
+        'version': version,
+        'entries': len(entries),
+        'summary': summary,
+        'findings': findings,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find duplicate and redundant entries in easystack files")
+    parser.add_argument('version', help="EESSI version (e.g. 2023.06)")
+    parser.add_argument('--easystacks-dir', default=EASYSTACKS_DIR,
+                        help="Directory with easystack files per EESSI version (default: %(default)s)")
+    parser.add_argument('--include-rebuilds', action='store_true', help="Also consider easystack files for rebuilds")
+    parser.add_argument('--files', nargs='+', metavar='FILE',
+                        help="Only report findings involving these easystack files (e.g. files changed in a PR)")
+    parser.add_argument('--baseline', metavar='REPORT',
+                        help="Ignore findings that are already in this JSON report (e.g. for the target branch of a PR)")
+    parser.add_argument('--fail-on', nargs='+', choices=FINDING_TYPES, default=[], metavar='TYPE',
+                        help="Exit with non-zero exit code if findings of these types are found "
+                             f"(one or more of: {', '.join(FINDING_TYPES)})")
+    parser.add_argument('-o', '--output', help="Write JSON report to specified file instead of stdout")
+
+    args = parser.parse_args()
+
+    entries = read_easystacks(args.version, easystacks_dir=args.easystacks_dir,
+                              include_rebuilds=args.include_rebuilds)
+    findings = find_duplicates(entries)
+    if args.files:
+        findings = filter_findings(findings, args.files)
+    if args.baseline:
+        with open(args.baseline) as fp:
+            findings = remove_known_findings(findings, json.load(fp))
+
+    report = json.dumps(make_report(args.version, entries, findings), indent=2)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            fp.write(report + '\n')
+    else:
+        print(report)
+
+    failures = [finding for finding in findings if finding['type'] in args.fail_on]
+    if failures:
+        for finding in failures:
+            locations = ', '.join(f"{entry['file']}:{entry['line']}" for entry in finding['entries'])
+            print(f"{finding['type']} ({finding['target']}): {finding['easyconfig']} in {locations}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
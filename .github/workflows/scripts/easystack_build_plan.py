@@ -0,0 +1,504 @@
+"""
+Create a build plan for the easystack files of a version of EESSI, as waves of builds that can run in parallel.
+
+The easyconfigs listed in the easystack files (see check_easystack_duplicates.py for how build targets are
+determined) are resolved in a local checkout of the easybuild-easyconfigs repository, together with all of their
+(build) dependencies and toolchains. This yields one dependency graph (DAG) per build target, in which
+dependencies shared by several easystack files only occur once.
+
+The graph is then partitioned in waves: all builds in a wave only depend on builds in earlier waves.
+Within a wave, builds are ordered by the length of the longest chain of builds that depends on them
+(the critical path), optionally weighted by historical build durations. If the number of build slots is limited,
+builds on the critical path are scheduled first.
+
+For a CPU specific target (e.g. zen4, or grace/accel/nvidia), the plan includes the easystacks for the less
+specific target as well (generic, or accel/nvidia), since that is what needs to be built for a new CPU target.
+For accelerator targets, dependencies that are part of the plan for the corresponding CPU target are considered
+to be available, and are listed as external; easyconfigs listed in the easystacks for an accelerator target are
+always part of its plan, even if they are also listed for the CPU target (like CUDA-Samples or OSU-Micro-Benchmarks).
+
+Easyconfigs that could not be found or parsed, unresolved dependencies, and unknown names that may affect
+dependencies (like ARCH) are reported per build and per target ('issues'); 'complete' is only true for a plan
+without any of these, so consumers can refuse a plan that can not be trusted.
+"""
+import argparse
+import builtins
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+
+from check_easystack_duplicates import EASYSTACKS_DIR, parent_target, read_easystacks
+
+SYSTEM_TOOLCHAIN_NAME = 'system'
+
+# subtoolchains of common toolchains, see also easybuild.tools.toolchain.toolchain in EasyBuild
+SUBTOOLCHAINS = {
+    'GCCcore': [],
+    'GCC': ['GCCcore'],
+    'gfbf': ['GCC'],
+    'gompi': ['GCC'],
+    'foss': ['gompi', 'gfbf'],
+    'gcccuda': ['GCC'],
+    'gompic': ['gcccuda'],
+    'fosscuda': ['gompic'],
+    'intel-compilers': ['GCCcore'],
+    'iccifort': ['GCCcore'],
+    'iimpi': ['intel-compilers'],
+    'iimkl': ['intel-compilers'],
+    'intel': ['iimpi', 'iimkl'],
+    'NVHPC': ['GCCcore'],
+    'nvompi': ['NVHPC'],
+    'nvofbf': ['nvompi'],
+    'lompi': ['LLVM'],
+    'LLVM': ['GCCcore'],
+}
+
+DEFAULT_DURATION = 1.0
+
+# names that are available in easyconfig files (subset of what EasyBuild provides)
+EASYCONFIG_CONSTANTS = {
+    'SYSTEM': {'name': SYSTEM_TOOLCHAIN_NAME, 'version': SYSTEM_TOOLCHAIN_NAME},
+    'EXTERNAL_MODULE': 'EXTERNAL_MODULE',
+}
+
+# EasyBuild constants that don't affect dependencies (source URLs/filenames, library extension, OS packages),
+# other unknown names (like ARCH) are recorded since they may affect which dependencies are used
+HARMLESS_CONSTANT_REGEX = re.compile(r'^(SOURCE(LOWER)?_\w+|\w+_(SOURCE|RELEASE|DOWNLOADS)|SHLIB_EXT|OS_PKG_\w+)$')
+
+
+class EasyconfigNamespace(dict):
+    """
+    Namespace to evaluate easyconfig files in: unknown names (EasyBuild constants and templates
+    that are not relevant here, like SOURCE_TAR_GZ) evaluate to their own name as a string.
+    Unknown names that may affect the result are recorded in unknown_names.
+    """
+
+    def __init__(self):
+        super().__init__(__builtins__=builtins)
+        self.unknown_names = set()
+
+    def __missing__(self, key):
+        if hasattr(builtins, key):
+            return getattr(builtins, key)
+        if key in EASYCONFIG_CONSTANTS:
+            return EASYCONFIG_CONSTANTS[key]
+        if not HARMLESS_CONSTANT_REGEX.match(key):
+            self.unknown_names.add(key)
+        return key
+
+
+def find_easyconfigs_dir(path):
+    """Return directory with easyconfig files, for a checkout of easybuild-easyconfigs or the directory itself."""
+    subdir = os.path.join(path, 'easybuild', 'easyconfigs')
+    return subdir if os.path.isdir(subdir) else path
+
+
+def index_easyconfigs(path):
+    """Return mapping of easyconfig filenames to their location."""
+    index = {}
+    for dirpath, _, filenames in os.walk(find_easyconfigs_dir(path)):
+        for filename in filenames:
+            if filename.endswith('.eb'):
+                index.setdefault(filename, os.path.join(dirpath, filename))
+    return index
+
+
+def parse_easyconfig(path):
+    """Parse easyconfig file, and return dictionary with the easyconfig parameters that are relevant here."""
+    namespace = EasyconfigNamespace()
+    with open(path) as fp:
+        # use namespace as globals, so names defined in the easyconfig are also visible in comprehensions
+        exec(compile(fp.read(), path, 'exec'), namespace)
+
+    toolchain = namespace.get('toolchain') or EASYCONFIG_CONSTANTS['SYSTEM']
+    if not isinstance(toolchain, dict):
+        toolchain = EASYCONFIG_CONSTANTS['SYSTEM']
+
+    return {
+        'name': namespace.get('name'),
+        'version': str(namespace.get('version', '')),
+        'versionsuffix': namespace.get('versionsuffix', ''),
+        'toolchain': toolchain,
+        'dependencies': list(namespace.get('dependencies', [])),
+        'builddependencies': list(namespace.get('builddependencies', [])),
+        'unknown_names': sorted(namespace.unknown_names),
+    }
+
+
+def easyconfig_filename(name, version, versionsuffix, toolchain):
+    """Construct filename of easyconfig file, following the EasyBuild naming scheme."""
+    if toolchain['name'] == SYSTEM_TOOLCHAIN_NAME:
+        return f"{name}-{version}{versionsuffix}.eb"
+    return f"{name}-{version}-{toolchain['name']}-{toolchain['version']}{versionsuffix}.eb"
+
+
+class DependencyResolver:
+    """Resolve dependencies of easyconfig files to easyconfig filenames, using an index of easyconfig files."""
+
+    def __init__(self, index):
+        self.index = index
+        self.parsed = {}
+        self.deps = {}
+        self.hierarchies = {}
+        self.unresolved = defaultdict(set)
+        self.errors = {}
+
+    def parse(self, filename):
+        """Return parsed easyconfig (or None if it's not available or can't be parsed)."""
+        if filename not in self.parsed:
+            self.parsed[filename] = None
+            if filename in self.index:
+                try:
+                    self.parsed[filename] = parse_easyconfig(self.index[filename])
+                except Exception as err:
+                    self.errors[filename] = f"{type(err).__name__}: {err}"
+                    print(f"Warning: failed to parse {self.index[filename]}: {err}", file=sys.stderr)
+        return self.parsed[filename]
+
+    def toolchain_filename(self, toolchain):
+        return easyconfig_filename(toolchain['name'], toolchain['version'], '', EASYCONFIG_CONSTANTS['SYSTEM'])
+
+    def toolchain_hierarchy(self, toolchain):
+        """
+        Return list of toolchains that can be used for dependencies with specified toolchain, most minimal first.
+
+        Versions of subtoolchains are taken from the dependencies of the toolchain easyconfig (e.g. GCC in foss),
+        and are otherwise assumed to be the same as for the toolchain (e.g. gompi for foss).
+        """
+        key = (toolchain['name'], toolchain['version'])
+        if key in self.hierarchies:
+            return self.hierarchies[key]
+
+        hierarchy = []
+        if toolchain['name'] != SYSTEM_TOOLCHAIN_NAME:
+            tc_ec = self.parse(self.toolchain_filename(toolchain))
+            tc_deps = {}
+            for dep in (tc_ec['dependencies'] if tc_ec else []):
+                if isinstance(dep, (list, tuple)) and len(dep) >= 2:
+                    tc_deps[dep[0]] = str(dep[1])
+            for subtc_name in SUBTOOLCHAINS.get(toolchain['name'], []):
+                subtc = {'name': subtc_name, 'version': tc_deps.get(subtc_name, toolchain['version'])}
+                for tc in self.toolchain_hierarchy(subtc):
+                    if tc not in hierarchy:
+                        hierarchy.append(tc)
+        hierarchy.append(toolchain)
+
+        self.hierarchies[key] = hierarchy
+        return hierarchy
+
+    def resolve_dep(self, dep, parent_toolchain):
+        """Return easyconfig filename for dependency specification of easyconfig with specified toolchain."""
+        if not isinstance(dep, (list, tuple)) or len(dep) < 2:
+            return None
+        name, version = dep[0], str(dep[1])
+        versionsuffix = dep[2] if len(dep) > 2 and isinstance(dep[2], str) else ''
+
+        if len(dep) > 3 and dep[3] == EASYCONFIG_CONSTANTS['EXTERNAL_MODULE']:
+            return None
+        if len(dep) > 3 and dep[3] is not False:
+            if isinstance(dep[3], dict):
+                candidates = [dep[3]]
+            elif isinstance(dep[3], (list, tuple)):
+                candidates = [{'name': dep[3][0], 'version': str(dep[3][1])}]
+            else:
+                # True means the dependency is installed with the system toolchain
+                candidates = [EASYCONFIG_CONSTANTS['SYSTEM']]
+        else:
+            candidates = self.toolchain_hierarchy(parent_toolchain)
+
+        for toolchain in candidates:
+            filename = easyconfig_filename(name, version, versionsuffix, toolchain)
+            if filename in self.index:
+                return filename
+        return None
+
+    def dependencies(self, filename):
+        """Return list of easyconfig filenames that need to be installed before the specified one."""
+        if filename in self.deps:
+            return self.deps[filename]
+
+        deps = []
+        ec = self.parse(filename)
+        if ec:
+            toolchain = ec['toolchain']
+            if toolchain['name'] != SYSTEM_TOOLCHAIN_NAME:
+                tc_filename = self.toolchain_filename(toolchain)
+                if tc_filename in self.index:
+                    deps.append(tc_filename)
+                else:
+                    self.unresolved[filename].add(tc_filename)
+            for dep in ec['builddependencies'] + ec['dependencies']:
+                dep_filename = self.resolve_dep(dep, toolchain)
+                if dep_filename:
+                    if dep_filename != filename and dep_filename not in deps:
+                        deps.append(dep_filename)
+                elif isinstance(dep, (list, tuple)) and dep and dep[-1] != EASYCONFIG_CONSTANTS['EXTERNAL_MODULE']:
+                    self.unresolved[filename].add('-'.join(str(x) for x in dep[:2]))
+
+        self.deps[filename] = deps
+        return deps
+
+
+def build_graph(roots, resolver, external=()):
+    """
+    Return dependency graph for specified easyconfigs, as a mapping of easyconfig filenames to their dependencies.
+
+    Dependencies in external are considered to be available, and are not included in the graph;
+    the specified easyconfigs themselves are always included.
+    """
+    external = set(external)
+    graph = {}
+    todo = list(roots)
+    while todo:
+        filename = todo.pop()
+        if filename in graph:
+            continue
+        deps = [dep for dep in resolver.dependencies(filename) if dep not in external]
+        graph[filename] = deps
+        todo.extend(dep for dep in deps if dep not in graph)
+    return graph
+
+
+def topological_order(graph):
+    """Return nodes of dependency graph so that every node comes after its dependencies."""
+    remaining = {node: len(deps) for node, deps in graph.items()}
+    dependents = dependents_of(graph)
+
+    order = []
+    ready = sorted(node for node, count in remaining.items() if count == 0)
+    while ready:
+        node = ready.pop()
+        order.append(node)
+        for dependent in dependents[node]:
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                ready.append(dependent)
+
+    if len(order) != len(graph):
+        cycle = sorted(node for node in graph if node not in order)
+        raise ValueError(f"Dependency cycle found involving: {', '.join(cycle)}")
+    return order
+
+
+def dependents_of(graph):
+    """Return mapping of nodes to the nodes that depend on them."""
+    dependents = defaultdict(list)
+    for node, deps in graph.items():
+        for dep in deps:
+            dependents[dep].append(node)
+    return dependents
+
+
+def critical_path_lengths(graph, durations, order):
+    """Return, for each node, the total duration of the longest chain of builds starting with that node."""
+    dependents = dependents_of(graph)
+    lengths = {}
+    for node in reversed(order):
+        lengths[node] = durations.get(node, DEFAULT_DURATION) + max((lengths[x] for x in dependents[node]), default=0)
+    return lengths
+
+
+def schedule_waves(graph, priorities, order, slots=None):
+    """
+    Partition dependency graph in waves, in which builds only depend on builds in earlier waves.
+
+    Builds are put in the earliest possible wave, unless the number of builds per wave is limited (slots),
+    in which case builds with the highest priority go first. Within each wave, builds are sorted by priority.
+    """
+    waves = []
+    wave_of = {}
+    if slots is None:
+        for node in order:
+            wave = max((wave_of[dep] + 1 for dep in graph[node]), default=0)
+            wave_of[node] = wave
+            if wave == len(waves):
+                waves.append([])
+            waves[wave].append(node)
+    else:
+        remaining = {node: len(deps) for node, deps in graph.items()}
+        dependents = dependents_of(graph)
+        ready = [node for node, count in remaining.items() if count == 0]
+        while ready:
+            ready.sort(key=lambda x: (-priorities[x], x))
+            wave, ready = ready[:slots], ready[slots:]
+            waves.append(wave)
+            for node in wave:
+                for dependent in dependents[node]:
+                    remaining[dependent] -= 1
+                    if remaining[dependent] == 0:
+                        ready.append(dependent)
+
+    return [sorted(wave, key=lambda x: (-priorities[x], x)) for wave in waves]
+
+
+def target_chain(target):
+    """Return list of targets whose easystacks are part of the build plan for the specified target."""
+    chain = [target]
+    parent = parent_target(target)
+    # specific targets also include everything that is built for the less specific target
+    # (generic for zen4, accel/nvidia for grace/accel/nvidia and accel/nvidia/zen4_h100);
+    # for accelerator targets, the CPU dependencies are provided by the plan for the corresponding CPU target
+    while parent is not None:
+        chain.insert(0, parent)
+        parent = parent_target(parent)
+    return chain
+
+
+def cpu_target(target):
+    """
+    Return CPU target that provides the dependencies for an accelerator target (or None for CPU targets):
+    generic for accel/nvidia, grace for grace/accel/nvidia, and zen4 for accel/nvidia/zen4_h100
+    (a CPU specific accelerator target below accel/<vendor> is named <cpu>_<gpu>).
+    """
+    parts = target.split('/') if target else []
+    if 'accel' not in parts:
+        return None
+    idx = parts.index('accel')
+    cpu_parts = parts[:idx] + [part.rsplit('_', 1)[0] for part in parts[idx + 2:]]
+    return '/'.join(cpu_parts)
+
+
+def plan_issues(nodes):
+    """
+    Collect nodes for which the dependencies may be incomplete or wrong: easyconfigs that were not found
+    or could not be parsed, that have unresolved dependencies, or that use unknown names (like ARCH).
+    """
+    issues = {
+        'not_found': sorted(x for x, node in nodes.items() if not node['resolved']),
+        'parse_errors': {x: node['parse_error'] for x, node in nodes.items() if node['parse_error']},
+        'unresolved_dependencies': {x: node['unresolved_dependencies'] for x, node in nodes.items()
+                                    if node['unresolved_dependencies']},
+        'unknown_names': {x: node['unknown_names'] for x, node in nodes.items() if node['unknown_names']},
+    }
+    issues['complete'] = not any(issues.values())
+    return issues
+
+
+def make_target_plan(target, entries, resolver, durations, slots=None, external=()):
+    """Create build plan for specified target, using easystack entries for this target (and less specific ones)."""
+    chain = target_chain(target)
+
+    # for each easyconfig, use the entry with the latest EasyBuild version
+    roots = {}
+    for entry in entries:
+        if entry['target'] in chain:
+            current = roots.get(entry['easyconfig'])
+            if current is None or (entry['eb_version'] or ()) >= (current['eb_version'] or ()):
+                roots[entry['easyconfig']] = entry
+
+    graph = build_graph(sorted(roots), resolver, external=external)
+    order = topological_order(graph)
+    critical_paths = critical_path_lengths(graph, durations, order)
+    waves = schedule_waves(graph, critical_paths, order, slots=slots)
+
+    nodes = {}
+    for filename in order:
+        entry = roots.get(filename)
+        ec = resolver.parse(filename)
+        nodes[filename] = {
+            'dependencies': sorted(graph[filename]),
+            'duration': durations.get(filename, DEFAULT_DURATION),
+            'critical_path': critical_paths[filename],
+            'easystack': entry['file'] if entry else None,
+            'eb_version': '.'.join(str(x) for x in entry['eb_version']) if entry and entry['eb_version'] else None,
+            'options': entry['options'] if entry else {},
+            'resolved': filename in resolver.index,
+            'parsed': ec is not None,
+            'parse_error': resolver.errors.get(filename),
+            'unknown_names': ec['unknown_names'] if ec else [],
+            'unresolved_dependencies': sorted(resolver.unresolved.get(filename, [])),
+        }
+
+    dependents = dependents_of(graph)
+    critical_path = []
+    node = max(critical_paths, key=lambda x: (critical_paths[x], x), default=None)
+    while node is not None:
+        critical_path.append(node)
+        node = max(dependents[node], key=lambda x: (critical_paths[x], x), default=None)
+
+    return {
+        'target': target or 'generic',
+        'easystack_targets': [x or 'generic' for x in chain],
+        'builds': len(nodes),
+        'waves': waves,
+        'critical_path': critical_path,
+        'critical_path_duration': critical_paths[critical_path[0]] if critical_path else 0,
+        'external': sorted({dep for deps in map(resolver.dependencies, graph) for dep in deps if dep in external}),
+        'issues': plan_issues(nodes),
+        'nodes': nodes,
+    }
+
+
+def make_build_plan(version, easyconfigs_dir, targets=None, durations=None, slots=None,
+                    easystacks_dir=EASYSTACKS_DIR):
+    """Create build plan (as a dictionary) for specified EESSI version, for all or the specified targets."""
+    durations = durations or {}
+    entries = read_easystacks(version, easystacks_dir=easystacks_dir)
+    resolver = DependencyResolver(index_easyconfigs(easyconfigs_dir))
+
+    if targets is None:
+        targets = sorted({entry['target'] for entry in entries})
+
+    plans = {}
+    for target in targets:
+        external = ()
+        if cpu_target(target) is not None:
+            cpu_plan = plans.get(cpu_target(target) or 'generic') or \
+                make_target_plan(cpu_target(target), entries, resolver, durations)
+            external = set(cpu_plan['nodes'])
+        plan = make_target_plan(target, entries, resolver, durations, slots=slots, external=external)
+        plans[plan['target']] = plan
+
+    return {
+        'version': version,
+        'slots': slots,
+        # whether all easyconfigs were found and parsed, and all dependencies resolved, for all targets
+        'complete': all(plan['issues']['complete'] for plan in plans.values()),
+        'summary': {
+            target: {key: len(value) for key, value in plan['issues'].items() if key != 'complete'}
+            for target, plan in plans.items()
+        },
+        'targets': plans,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create build plan with parallel waves for easystack files")
+    parser.add_argument('version', help="EESSI version (e.g. 2023.06)")
+    parser.add_argument('easyconfigs_dir', help="Path to checkout of easybuild-easyconfigs repository")
+    parser.add_argument('--easystacks-dir', default=EASYSTACKS_DIR,
+                        help="Directory with easystack files per EESSI version (default: %(default)s)")
+    parser.add_argument('--target', action='append', dest='targets', metavar='TARGET',
+                        help="Build target to create plan for (e.g. generic, zen4, accel/nvidia); "
+                             "can be used multiple times (default: all targets)")
+    parser.add_argument('--durations', metavar='FILE',
+                        help="JSON file with historical build durations, as mapping of easyconfig filename to seconds")
+    parser.add_argument('--slots', type=int, help="Maximum number of builds per wave")
+    parser.add_argument('-o', '--output', help="Write JSON build plan to specified file instead of stdout")
+
+    args = parser.parse_args()
+
+    durations = {}
+    if args.durations:
+        with open(args.durations) as fp:
+            durations = json.load(fp)
+
+    targets = None
+    if args.targets:
+        targets = ['' if target == 'generic' else target for target in args.targets]
+
+    plan = make_build_plan(args.version, args.easyconfigs_dir, targets=targets, durations=durations,
+                           slots=args.slots, easystacks_dir=args.easystacks_dir)
+
+    output = json.dumps(plan, indent=2)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            fp.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
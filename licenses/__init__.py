@@ -0,0 +1,17 @@
+"""
+Tools to collect, check and update license information for software installed in EESSI.
+
+Submodules are only imported when they are first accessed, so importing this package
+(or running 'python -m licenses --help') does not pull in requests or PyYAML,
+and does not read the SPDX license list.
+"""
+import importlib
+
+__all__ = ['check_http_client', 'cli', 'history', 'http_client', 'link_extractor', 'parse_licenses',
+           'parsing_easyconfigs', 'spdx', 'update_licenses']
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f'.{name}', __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,148 @@
+"""
+Check the rate limit handling of HttpClient against a local stand-in server:
+
+    python -m licenses.check_http_client
+
+The server rejects the first request to each path like GitHub and ecosyste.ms do when a rate limit is hit
+(429 with Retry-After, 403 with X-RateLimit-Remaining: 0); the client is expected to wait as long as it is told
+to, and to retry. The client does not really sleep, the requested delays are recorded instead.
+
+Connection slots for streamed responses should be held until the response is closed,
+and concurrent first calls of get_client should all get the same client.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import http_client
+from .http_client import HttpClient
+
+RETRY_AFTER = 3
+RATE_LIMIT_RESET = 5
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Request handler that is rate limited for the first request to each path."""
+
+    hits = Counter()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            self.hits[self.path] += 1
+            first = self.hits[self.path] == 1
+
+        if self.path == '/redirect':
+            # redirect to a different host name for the same server
+            self.reply(302, {'Location': f"http://127.0.0.1:{self.server.server_port}/always-429"})
+        elif self.path == '/always-429':
+            self.reply(429, {'Retry-After': str(RETRY_AFTER)})
+        elif first and self.path == '/retry-after':
+            self.reply(429, {'Retry-After': str(RETRY_AFTER)})
+        elif first and self.path == '/rate-limit':
+            self.reply(403, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(int(time.time()) + RATE_LIMIT_RESET)})
+        else:
+            self.reply(200, {'X-RateLimit-Remaining': '100', 'X-RateLimit-Reset': str(int(time.time()) + 3600)})
+
+    def reply(self, status, headers):
+        body = b'ok' if status == 200 else b'rate limited'
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_client(**kwargs):
+    """Return HttpClient that records the delays it is asked to wait, instead of sleeping."""
+    sleeps = []
+    client = HttpClient(sleep=sleeps.append, **kwargs)
+    return client, sleeps
+
+
+def check_retry_after(base_url):
+    client, sleeps = make_client()
+    response = client.get(f"{base_url}/retry-after")
+    assert response.status_code == 200, f"expected retry to succeed, got {response.status_code}"
+    assert StandInHandler.hits['/retry-after'] == 2, f"expected 2 requests, got {StandInHandler.hits['/retry-after']}"
+    assert sleeps and RETRY_AFTER - 1 <= max(sleeps) <= RETRY_AFTER, f"expected wait of ~{RETRY_AFTER}s, got {sleeps}"
+
+
+def check_rate_limit_exhausted(base_url):
+    client, sleeps = make_client()
+    response = client.get(f"{base_url}/rate-limit")
+    assert response.status_code == 200, f"expected retry to succeed, got {response.status_code}"
+    assert StandInHandler.hits['/rate-limit'] == 2, f"expected 2 requests, got {StandInHandler.hits['/rate-limit']}"
+    assert sleeps and RATE_LIMIT_RESET - 2 <= max(sleeps) <= RATE_LIMIT_RESET + 1, \
+        f"expected wait of ~{RATE_LIMIT_RESET}s, got {sleeps}"
+
+
+def check_redirect(base_url):
+    client, sleeps = make_client(max_retries=0)
+    response = client.get(f"{base_url}/redirect")
+    assert response.status_code == 429, f"expected rate limited response, got {response.status_code}"
+    # the host that was requested is paused, not the one that was redirected to
+    requested = client.bucket(base_url)
+    redirected = client.bucket(response.url)
+    assert requested is not redirected, "expected redirect to a different host"
+    assert requested.blocked_until > client.clock(), "requested host should be paused after rate limited response"
+    assert redirected.blocked_until <= client.clock(), "redirect target should not be paused"
+
+
+def check_streamed_slot(base_url):
+    client, sleeps = make_client()
+    response = client.get(f"{base_url}/streamed", stream=True)
+    assert client.slots.in_use == 1, "connection slot should be held until streamed response is closed"
+    response.close()
+    response.close()
+    assert client.slots.in_use == 0, f"expected connection slot to be released once, {client.slots.in_use} in use"
+
+
+def check_shared_client(base_url):
+    http_client.client = None
+    barrier = threading.Barrier(8)
+    clients = []
+
+    def get_client():
+        barrier.wait()
+        clients.append(http_client.get_client())
+
+    threads = [threading.Thread(target=get_client) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(client) for client in clients}) == 1, "expected all threads to get the same client"
+
+
+def main():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://localhost:{server.server_port}"
+
+    failed = False
+    try:
+        for check in (check_retry_after, check_rate_limit_exhausted, check_redirect, check_streamed_slot,
+                      check_shared_client):
+            try:
+                check(base_url)
+                print(f"{check.__name__}: OK")
+            except AssertionError as err:
+                print(f"{check.__name__}: FAILED ({err})")
+                failed = True
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Command line interface for the license tools: python -m licenses <stage> [<args>] [+ <stage> [<args>] ...]
+
+Stages can be chained with a '+' separator, in which case they run in a single process.
+Results are only handed to the next stage in memory for the combinations in CHAINED_STAGES, for example:
+
+    python -m licenses fetch-sources missing_modules.txt + resolve licenses/licenses.yml
+
+Other stages always read their input from the files specified on the command line.
+
+Only the requested stages import their (third-party) dependencies.
+All HTTP requests are throttled per host by the shared client in http_client.py.
+"""
+import argparse
+import json
+import logging
+import sys
+
+from .http_client import DEFAULT_MAX_CONCURRENCY
+
+STAGE_SEPARATOR = '+'
+
+# pairs of stages for which the output of the first stage is used as input of the second one
+CHAINED_STAGES = {
+    ('fetch-sources', 'resolve'),
+}
+
+# use more workers than the shared HTTP client has connection slots, so requests queue up for a slot
+# and the ones with a higher priority (ecosyste.ms lookups before homepage scrapes) are served first
+DEFAULT_JOBS = 2 * DEFAULT_MAX_CONCURRENCY
+
+
+def fetch_sources(args, data):
+    """Find homepage and source URL for each module, by parsing its easyconfig file."""
+    from .parsing_easyconfigs import load_modules_from_file, process_modules
+
+    module_list = load_modules_from_file(args.module_list)
+    results = process_modules(module_list, jobs=args.jobs)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"Results saved to {args.output}")
+
+    return results
+
+
+def resolve(args, data):
+    """Try to determine the license of each module, and merge results with the original licenses file."""
+    from . import parse_licenses
+
+    if args.debug:
+        parse_licenses.DEBUG_MODE = True
+
+    if args.input:
+        modules = parse_licenses.load_modules(args.input)
+    else:
+        modules = data
+
+    results = parse_licenses.process_modules_for_licenses(modules, jobs=args.jobs)
+    parse_licenses.save_license_results(results, args.licenses_original, output_file=args.output,
+                                        print_file=args.print_file)
+    return results
+
+
+def check_spdx(args, data):
+    """Check that the SPDX identifiers in a licenses.json file are valid."""
+    from . import spdx
+
+    if args.online:
+        spdx.get_spdx_license_list(online=True)
+
+    licenses = spdx.read_licenses(args.licenses)
+    if spdx.check_licenses(licenses):
+        logging.info("All license checks PASSED!")
+    else:
+        logging.error("One or more licence checks failed!")
+        raise SystemExit(2)
+
+    return licenses
+
+
+def update(args, data):
+    """Fetch license for project(s) from ecosyste.ms, and update licenses.json."""
+    from . import update_licenses
+
+    return update_licenses.run(args, path=args.licenses)
+
+
+def show_history(args, data):
+    """Show license history of project(s), or compact the history in licenses.json."""
+    from . import history, update_licenses
+
+    licenses = update_licenses.load_licenses(args.licenses)
+
+    if args.compact:
+        with open(args.licenses, 'w') as lic_file:
+            lic_file.write(update_licenses.generate_patch(licenses))
+        print(f"Compacted license history in {args.licenses}")
+
+    for project in args.project:
+        entry = licenses.get(project, {})
+        if args.at:
+            intervals = [interval for interval in [history.license_at(entry, args.at)] if interval]
+        else:
+            intervals = entry.get('history', [])
+        if not intervals:
+            print(f"{project}: no license known")
+        for interval in intervals:
+            print(f"{project}: {interval['license']} (source: {interval.get('source')}; "
+                  f"first seen {interval['first_seen']}, last confirmed {interval['last_confirmed']})")
+
+    return licenses
+
+
+def validate_repo_format(value):
+    from .update_licenses import validate_repo_format
+    return validate_repo_format(value)
+
+
+def validate_registry(value):
+    from .update_licenses import validate_registry
+    return validate_registry(value)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m licenses', description='Tools to collect and check licenses',
+                                     epilog=f"Stages can be chained with '{STAGE_SEPARATOR}'; results of "
+                                            "fetch-sources are passed to a following resolve stage in memory.")
+    subparsers = parser.add_subparsers(dest='stage', metavar='STAGE', required=True)
+
+    fetch_parser = subparsers.add_parser('fetch-sources', help=fetch_sources.__doc__)
+    fetch_parser.add_argument('module_list', help='Path to text file with one module name per line')
+    fetch_parser.add_argument('-o', '--output', help='Also save results to specified JSON file')
+    fetch_parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS,
+                              help='Number of modules to process in parallel (default: %(default)s)')
+    fetch_parser.set_defaults(func=fetch_sources)
+
+    resolve_parser = subparsers.add_parser('resolve', help=resolve.__doc__)
+    resolve_parser.add_argument('licenses_original', help='Path to the original licenses file (licenses.yml)')
+    resolve_parser.add_argument('-i', '--input', help='Path to JSON file with module data (modules_results.json)')
+    resolve_parser.add_argument('-o', '--output', default='licenses_aux.yaml',
+                                help='Path to the merged licenses file (default: %(default)s)')
+    resolve_parser.add_argument('--print-file', default='temporal_print.yaml',
+                                help='Path to file with only the new license info (default: %(default)s)')
+    resolve_parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS,
+                                help='Number of modules to process in parallel (default: %(default)s)')
+    resolve_parser.add_argument('--debug', help='Prints scripts debugging', action='store_true')
+    resolve_parser.set_defaults(func=resolve)
+
+    check_parser = subparsers.add_parser('check-spdx', help=check_spdx.__doc__)
+    check_parser.add_argument('licenses', help='Path to licenses.json')
+    check_parser.add_argument('--online', action='store_true',
+                              help='Download current SPDX license list instead of using spdx-list.json')
+    check_parser.set_defaults(func=check_spdx)
+
+    update_parser = subparsers.add_parser('update', help=update.__doc__)
+    update_parser.add_argument('project', nargs='+', help='List of project name')
+    update_parser.add_argument('--manual', help='Manually provided license', required=False)
+    update_parser.add_argument('--spdx', help='SPDX identifier for the license', required=False)
+    update_parser.add_argument('--licenses', default='licenses.json', help='Path to licenses.json (default: %(default)s)')
+    group = update_parser.add_mutually_exclusive_group()
+    group.add_argument('--registry', help='Origin registry. Use "--registry help" to see all available options',
+                       metavar='REGISTRY', type=validate_registry)
+    group.add_argument('--repo', help='Origin repository. Format: <host>:<user>/<repo>. '
+                       'All available hosts shown with "--repo help"', metavar='REPOSITORY', type=validate_repo_format)
+    update_parser.set_defaults(func=update)
+
+    history_parser = subparsers.add_parser('history', help=show_history.__doc__)
+    history_parser.add_argument('project', nargs='*', help='List of project name')
+    history_parser.add_argument('--at', help='Only show license in effect at specified date/time (ISO 8601)')
+    history_parser.add_argument('--compact', action='store_true', help='Rewrite licenses.json with compacted history')
+    history_parser.add_argument('--licenses', default='licenses.json',
+                                help='Path to licenses.json (default: %(default)s)')
+    history_parser.set_defaults(func=show_history)
+
+    return parser
+
+
+def split_stages(argv):
+    """Split list of command line arguments into a list of arguments per stage."""
+    stages = [[]]
+    for arg in argv:
+        if arg == STAGE_SEPARATOR:
+            stages.append([])
+        else:
+            stages[-1].append(arg)
+    return [stage for stage in stages if stage]
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    parser = build_parser()
+    stages = [parser.parse_args(stage_argv) for stage_argv in split_stages(argv) or [[]]]
+
+    # check chain before running anything, so we don't fail after a long running stage
+    previous = None
+    for args in stages:
+        if args.stage == 'resolve' and not args.input and (previous, args.stage) not in CHAINED_STAGES:
+            parser.error("resolve: no module data specified (use --input, or chain after fetch-sources)")
+        previous = args.stage
+
+    data, previous = None, None
+    for args in stages:
+        data = args.func(args, data if (previous, args.stage) in CHAINED_STAGES else None)
+        previous = args.stage
+
+    return 0
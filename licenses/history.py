@@ -0,0 +1,167 @@
+"""
+Compact license history for projects in licenses.json.
+
+The history of a project only records changes: it is a list of intervals, sorted by first_seen,
+each of the form {"license", "source", "first_seen", "last_confirmed"}. Retrieving a license
+that is the same as the one in the last interval only bumps its last_confirmed timestamp,
+so the size of licenses.json depends on the number of actual license changes, not on how often
+licenses are retrieved.
+
+Histories in the old format (one {"license", "retrieved_at"} entry per retrieval) are converted
+by compact_history. Entries without a source match any source, and take the source of the first
+retrieval that confirms them.
+
+Timestamps without a time zone are in local time (as written by older versions of update_licenses.py).
+All timestamps in a history are stored in UTC, in a fixed format (see to_timestamp), so they sort chronologically
+as strings: license_at and licenses_between only compare strings in a binary search, and expect a history
+that was written by record or compact_history (load_licenses in update_licenses.py compacts on load).
+"""
+import bisect
+from datetime import datetime, timezone
+
+LICENSE = 'license'
+SOURCE = 'source'
+FIRST_SEEN = 'first_seen'
+LAST_CONFIRMED = 'last_confirmed'
+RETRIEVED_AT = 'retrieved_at'
+
+# license value for a failed lookup, which is not recorded in the history
+NOT_FOUND = 'not found'
+
+
+def to_datetime(value):
+    """Convert ISO 8601 timestamp (or date), or datetime object, to a datetime object in UTC."""
+    if not isinstance(value, datetime):
+        value = value.strip()
+        if value.endswith(('Z', 'z')):
+            value = value[:-1] + '+00:00'
+        value = datetime.fromisoformat(value)
+    # for naive datetime objects, astimezone assumes local time
+    return value.astimezone(timezone.utc)
+
+
+def to_timestamp(value):
+    """Convert ISO 8601 timestamp (or date), or datetime object, to the UTC timestamp string stored in histories."""
+    return to_datetime(value).isoformat(timespec='seconds')
+
+
+def to_interval(entry):
+    """Convert history entry (old or new format) to an interval, with normalized timestamps."""
+    if FIRST_SEEN in entry:
+        interval = dict(entry)
+    else:
+        interval = {
+            LICENSE: entry.get(LICENSE),
+            SOURCE: entry.get(SOURCE),
+            FIRST_SEEN: entry[RETRIEVED_AT],
+            LAST_CONFIRMED: entry[RETRIEVED_AT],
+        }
+    interval[FIRST_SEEN] = to_timestamp(interval[FIRST_SEEN])
+    interval[LAST_CONFIRMED] = to_timestamp(interval[LAST_CONFIRMED])
+    return interval
+
+
+def is_failed_lookup(license):
+    """Check whether license is the result of a failed lookup (older versions stored ["not found", null, null])."""
+    if isinstance(license, (list, tuple)):
+        return bool(license) and license[0] == NOT_FOUND
+    return license == NOT_FOUND
+
+
+def same_license(interval, license, source):
+    """Check whether interval is for the same license and source; an interval without source matches any source."""
+    return interval[LICENSE] == license and interval.get(SOURCE) in (None, source)
+
+
+def confirm(interval, source, confirmed_at):
+    """Extend interval until confirmed_at (if that is later), and fill in its source if it was unknown."""
+    if interval.get(SOURCE) is None:
+        interval[SOURCE] = source
+    confirmed_at = to_timestamp(confirmed_at)
+    if confirmed_at > interval[LAST_CONFIRMED]:
+        interval[LAST_CONFIRMED] = confirmed_at
+
+
+def compact_history(history):
+    """
+    Return history as a list of intervals, merging consecutive entries for the same license and source.
+    Entries for failed lookups are dropped.
+    """
+    intervals = sorted((to_interval(entry) for entry in history if not is_failed_lookup(entry.get(LICENSE))),
+                       key=lambda x: x[FIRST_SEEN])
+
+    compacted = []
+    for interval in intervals:
+        if compacted and same_license(compacted[-1], interval[LICENSE], interval.get(SOURCE)):
+            confirm(compacted[-1], interval.get(SOURCE), interval[LAST_CONFIRMED])
+        else:
+            compacted.append(interval)
+
+    return compacted
+
+
+def compact(licenses):
+    """Compact history of all projects in licenses (in place), and return licenses."""
+    for entry in licenses.values():
+        if 'history' in entry:
+            entry['history'] = compact_history(entry['history'])
+    return licenses
+
+
+def record(entry, info):
+    """
+    Record license info ({"license", "source", "retrieved_at"}) in history of a project (in place).
+
+    Returns True if the license changed (or is new), False if only the existing interval was confirmed.
+    """
+    history = entry.setdefault('history', [])
+    license, source, retrieved_at = info.get(LICENSE), info.get(SOURCE), to_timestamp(info[RETRIEVED_AT])
+    entry['current'] = info
+
+    if history and same_license(history[-1], license, source):
+        confirm(history[-1], source, retrieved_at)
+        return False
+
+    history.append({
+        LICENSE: license,
+        SOURCE: source,
+        FIRST_SEEN: retrieved_at,
+        LAST_CONFIRMED: retrieved_at,
+    })
+    return True
+
+
+def first_seen(interval):
+    return interval[FIRST_SEEN]
+
+
+def license_at(entry, when):
+    """
+    Return the history interval that was in effect for a project at the specified time, or None.
+
+    A license is considered in effect from when it was first seen until a different license was first seen;
+    the last interval is in effect until its last_confirmed timestamp.
+    """
+    history = entry.get('history', [])
+    when = to_timestamp(when)
+
+    idx = bisect.bisect_right(history, when, key=first_seen) - 1
+    if idx < 0:
+        return None
+    if idx == len(history) - 1 and when > history[idx][LAST_CONFIRMED]:
+        return None
+    return history[idx]
+
+
+def licenses_between(entry, start, end):
+    """Return the history intervals of a project that were in effect at some point between start and end."""
+    history = entry.get('history', [])
+    start, end = to_timestamp(start), to_timestamp(end)
+
+    first = max(bisect.bisect_right(history, start, key=first_seen) - 1, 0)
+    last = bisect.bisect_right(history, end, key=first_seen)
+    intervals = history[first:last]
+    # the last interval is only in effect until it was last confirmed
+    if intervals and first == len(history) - 1 and history[-1][LAST_CONFIRMED] < start:
+        return []
+    return intervals
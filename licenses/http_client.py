@@ -0,0 +1,289 @@
+"""
+Shared HTTP client for the license tools, which throttles outbound requests.
+
+All requests go through a single HttpClient instance (see get_client), which provides:
+
+* a token bucket per host, so each upstream service is queried no faster than it allows;
+* adherence to Retry-After and (X-)RateLimit-* response headers: a host is paused until its
+  rate limit resets, and requests that were rejected because of a rate limit are retried;
+* a global cap on the number of concurrent requests, with slots handed out by priority,
+  so easyconfig fetches go before ecosyste.ms lookups, which go before homepage scrapes;
+  for streamed responses (stream=True), the slot is only released when the response is closed,
+  so callers must always close those (like link_extractor.py does).
+  Priorities only have an effect when more threads make requests than there are slots
+  (see DEFAULT_JOBS in cli.py).
+
+Requests that fail for other reasons are not retried, and exceptions raised by requests
+are passed on to the caller as is.
+"""
+import heapq
+import itertools
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+# Request priorities (lower value is served first)
+PRIORITY_EASYCONFIG = 0
+PRIORITY_API = 1
+PRIORITY_SCRAPE = 2
+
+# Default rate (requests per second) and burst size per host
+DEFAULT_HOST_LIMITS = {
+    'raw.githubusercontent.com': (5.0, 10),
+    'api.github.com': (1.0, 5),
+    'github.com': (2.0, 5),
+    'repos.ecosyste.ms': (1.4, 10),
+    'packages.ecosyste.ms': (1.4, 10),
+}
+DEFAULT_HOST_LIMIT = (2.0, 4)
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_RETRIES = 3
+# Don't wait longer than this (in seconds) for a rate limit to reset, return the response instead
+DEFAULT_MAX_WAIT = 300
+DEFAULT_TIMEOUT = 30
+
+RATE_LIMIT_STATUS_CODES = (429, 503)
+
+client = None
+client_lock = threading.Lock()
+
+
+class HostBucket:
+    """Token bucket for a single host, which can be paused until a given time."""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.default_rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Take a token, and return how long (in seconds) to wait before using it."""
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(delay, self.blocked_until - now)
+
+    def block_for(self, delay):
+        """Don't hand out usable tokens for the specified number of seconds."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, self.clock() + delay)
+
+    def adapt(self, remaining, reset_in):
+        """Spread the remaining requests of the current rate limit window over the time left in it."""
+        with self.lock:
+            if reset_in > 0:
+                self.rate = max(min(self.default_rate, remaining / reset_in), 1.0 / reset_in)
+            else:
+                self.rate = self.default_rate
+
+
+class PrioritySlots:
+    """Semaphore that hands out free slots to waiters with the lowest priority value first."""
+
+    def __init__(self, size):
+        self.size = size
+        self.in_use = 0
+        self.waiters = []
+        self.counter = itertools.count()
+        self.cond = threading.Condition()
+
+    def acquire(self, priority):
+        with self.cond:
+            entry = (priority, next(self.counter))
+            heapq.heappush(self.waiters, entry)
+            while self.in_use >= self.size or self.waiters[0] != entry:
+                self.cond.wait()
+            heapq.heappop(self.waiters)
+            self.in_use += 1
+            # next waiter in line may be able to get a slot too
+            self.cond.notify_all()
+
+    def release(self):
+        with self.cond:
+            self.in_use -= 1
+            self.cond.notify_all()
+
+
+def parse_retry_after(value, now=None):
+    """Parse value of Retry-After header (number of seconds, or HTTP date) into a delay in seconds."""
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at - (time.time() if now is None else now))
+
+
+def parse_rate_limit(headers, now=None):
+    """
+    Determine (remaining, reset_in) from X-RateLimit-* or RateLimit-* headers.
+
+    X-RateLimit-Reset is an epoch timestamp for GitHub, while RateLimit-Reset is a number of seconds;
+    large values are treated as timestamps either way. Returns None if no usable headers are found.
+    """
+    for prefix in ('X-RateLimit-', 'RateLimit-'):
+        remaining = headers.get(prefix + 'Remaining')
+        reset = headers.get(prefix + 'Reset')
+        if remaining is None or reset is None:
+            continue
+        try:
+            remaining, reset = int(remaining), float(reset)
+        except ValueError:
+            continue
+        if reset > 1e9:
+            reset -= time.time() if now is None else now
+        return remaining, max(0.0, reset)
+    return None
+
+
+class HttpClient:
+    """Rate limited, priority aware wrapper around a requests session."""
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY, host_limits=None, max_retries=DEFAULT_MAX_RETRIES,
+                 max_wait=DEFAULT_MAX_WAIT, timeout=DEFAULT_TIMEOUT, clock=time.monotonic, sleep=time.sleep,
+                 session=None):
+        self.host_limits = dict(DEFAULT_HOST_LIMITS)
+        if host_limits:
+            self.host_limits.update(host_limits)
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.clock = clock
+        self.sleep = sleep
+        self.session = session
+        self.slots = PrioritySlots(max_concurrency)
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def get_session(self):
+        with self.lock:
+            if self.session is None:
+                import requests
+                self.session = requests.Session()
+            return self.session
+
+    def bucket(self, url):
+        """Return token bucket for the host of the specified URL."""
+        host = urlsplit(url).netloc.lower()
+        with self.lock:
+            if host not in self.buckets:
+                rate, burst = self.host_limits.get(host, DEFAULT_HOST_LIMIT)
+                self.buckets[host] = HostBucket(rate, burst, clock=self.clock)
+            return self.buckets[host]
+
+    def wait_time(self, response, bucket):
+        """
+        Update rate limit state of the host (token bucket) from the response headers, and return how long to wait
+        before retrying if the request was rejected because of a rate limit (None otherwise).
+
+        The bucket is the one of the requested URL, not of response.url, which is different after a redirect.
+        """
+        headers = response.headers
+        retry_after = parse_retry_after(headers.get('Retry-After'))
+        rate_limit = parse_rate_limit(headers)
+
+        if rate_limit is not None:
+            remaining, reset_in = rate_limit
+            bucket.adapt(remaining, reset_in)
+            if remaining <= 0:
+                bucket.block_for(reset_in)
+
+        if retry_after is not None:
+            bucket.block_for(retry_after)
+
+        if response.status_code in RATE_LIMIT_STATUS_CODES or (response.status_code == 403 and rate_limit
+                                                                 and rate_limit[0] <= 0):
+            if retry_after is not None:
+                return retry_after
+            if rate_limit is not None:
+                return rate_limit[1]
+            if response.status_code == 429:
+                # rate limited without any hint on when to retry: back off for one token
+                delay = 1.0 / bucket.rate
+                bucket.block_for(delay)
+                return delay
+        return None
+
+    def request(self, method, url, priority=PRIORITY_API, **kwargs):
+        """Perform an HTTP request; same arguments as requests.request, plus a priority."""
+        kwargs.setdefault('timeout', self.timeout)
+        session = self.get_session()
+        bucket = self.bucket(url)
+
+        for attempt in range(self.max_retries + 1):
+            delay = bucket.reserve()
+            if delay > 0:
+                self.sleep(delay)
+
+            self.slots.acquire(priority)
+            try:
+                response = session.request(method, url, **kwargs)
+            except BaseException:
+                self.slots.release()
+                raise
+            if kwargs.get('stream'):
+                # body is only downloaded later, keep the slot until the response is closed
+                self.release_slot_on_close(response)
+            else:
+                self.slots.release()
+
+            wait = self.wait_time(response, bucket)
+            if wait is None or wait > self.max_wait or attempt == self.max_retries:
+                return response
+            response.close()
+
+        return response
+
+    def release_slot_on_close(self, response):
+        """Release connection slot (only once) when the specified response is closed."""
+        close = response.close
+        released = threading.Lock()
+
+        def close_and_release():
+            try:
+                close()
+            finally:
+                if released.acquire(blocking=False):
+                    self.slots.release()
+
+        response.close = close_and_release
+
+    def get(self, url, priority=PRIORITY_API, **kwargs):
+        return self.request('GET', url, priority=priority, **kwargs)
+
+
+def get_client():
+    """Return shared HTTP client, creating it with default settings on first use."""
+    global client
+    # the first requests are made from worker threads, make sure they all use the same client
+    with client_lock:
+        if client is None:
+            client = HttpClient()
+        return client
+
+
+def configure_client(**kwargs):
+    """(Re)create shared HTTP client with specified settings (see HttpClient)."""
+    global client
+    with client_lock:
+        client = HttpClient(**kwargs)
+        return client
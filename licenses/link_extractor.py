@@ -0,0 +1,152 @@
+"""
+Bounded, streaming extraction of links from HTML pages.
+
+Pages are downloaded in chunks and fed to an incremental HTML parser, rather than downloading
+the whole page and building a complete document tree. Parsing stops as soon as a link with the
+best possible score is found, or when the byte limit is reached; non-HTML responses are not parsed.
+"""
+import codecs
+import posixpath
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+from .http_client import PRIORITY_SCRAPE, get_client
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+DEFAULT_MAX_TEXT_BYTES = 1024 * 1024
+CHUNK_SIZE = 16 * 1024
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+LICENSE_LINK_TEXT_REGEX = re.compile(r"license|copying|copyright|legal", re.IGNORECASE)
+LICENSE_FILE_REGEX = re.compile(r"^(licen[cs]e|copying)([.-][\w.-]*)?$", re.IGNORECASE)
+DEFAULT_BRANCH_REGEX = re.compile(r"/(blob|raw)/(main|master|HEAD)/")
+
+# best possible score of license_link_score
+LICENSE_LINK_MAX_SCORE = 3
+
+
+class LinkExtractor(HTMLParser):
+    """
+    Incremental HTML parser that scores each <a href=...> link with the text it contains.
+
+    score_link(href, text) should return a numeric score for links that qualify, or None.
+    The best scoring link is kept, and the parser is marked as done once a link scores stop_score.
+    """
+
+    def __init__(self, score_link, stop_score=None):
+        super().__init__(convert_charrefs=True)
+        self.score_link = score_link
+        self.stop_score = stop_score
+        self.best = None
+        self.best_score = None
+        self.done = False
+        self.href = None
+        self.text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            # nested links are not valid HTML, treat a new <a> as the end of the previous one
+            self.finish_link()
+            href = dict(attrs).get('href')
+            if href:
+                self.href = href
+                self.text = []
+
+    def handle_data(self, data):
+        if self.href is not None:
+            self.text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == 'a':
+            self.finish_link()
+
+    def finish_link(self):
+        if self.href is None or self.done:
+            self.href = None
+            return
+        score = self.score_link(self.href, ''.join(self.text))
+        if score is not None and (self.best_score is None or score > self.best_score):
+            self.best, self.best_score = self.href, score
+            if self.stop_score is not None and score >= self.stop_score:
+                self.done = True
+        self.href = None
+
+    def close(self):
+        super().close()
+        self.finish_link()
+
+
+def is_html(response):
+    content_type = response.headers.get('Content-Type', '')
+    # assume HTML if server doesn't tell us
+    return not content_type or content_type.split(';')[0].strip().lower() in HTML_CONTENT_TYPES
+
+
+def iter_text(response, max_bytes):
+    """Yield decoded chunks of the response body, up to max_bytes bytes."""
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    received = 0
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        chunk = chunk[:max_bytes - received]
+        received += len(chunk)
+        yield decoder.decode(chunk)
+        if received >= max_bytes:
+            return
+    yield decoder.decode(b'', final=True)
+
+
+def find_link(url, score_link, stop_score=None, max_bytes=DEFAULT_MAX_BYTES, priority=PRIORITY_SCRAPE, timeout=10):
+    """
+    Return (absolute URL, href, score) for the best scoring link on the specified page, or None.
+
+    HTTP errors are raised as requests exceptions, like for response.raise_for_status().
+    """
+    response = get_client().get(url, priority=priority, timeout=timeout, stream=True)
+    try:
+        response.raise_for_status()
+        if not is_html(response):
+            return None
+
+        parser = LinkExtractor(score_link, stop_score=stop_score)
+        for text in iter_text(response, max_bytes):
+            parser.feed(text)
+            if parser.done:
+                break
+        else:
+            parser.close()
+    finally:
+        response.close()
+
+    if parser.best is None:
+        return None
+    return urljoin(response.url or url, parser.best), parser.best, parser.best_score
+
+
+def fetch_text(url, max_bytes=DEFAULT_MAX_TEXT_BYTES, priority=PRIORITY_SCRAPE, timeout=10):
+    """Return (at most max_bytes of) the body of the specified URL as text."""
+    response = get_client().get(url, priority=priority, timeout=timeout, stream=True)
+    try:
+        response.raise_for_status()
+        return ''.join(iter_text(response, max_bytes))
+    finally:
+        response.close()
+
+
+def license_link_score(href, text):
+    """
+    Score links to license information: links must mention license/copying/copyright/legal,
+    links to a LICENSE or COPYING file are preferred, especially on the default branch.
+    """
+    filename = posixpath.basename(urlsplit(href).path.rstrip('/'))
+    is_license_file = bool(LICENSE_FILE_REGEX.match(filename))
+    if not (is_license_file or LICENSE_LINK_TEXT_REGEX.search(text)):
+        return None
+
+    score = 1
+    if is_license_file:
+        score += 1
+        if DEFAULT_BRANCH_REGEX.search(href):
+            score += 1
+    return score
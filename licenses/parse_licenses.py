@@ -1,12 +1,11 @@
-import requests
 import json
-import os
 import re
-import argparse
-import yaml
-import shutil
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import quote
-from bs4 import BeautifulSoup
+
+from .http_client import PRIORITY_API, get_client
+from .link_extractor import LICENSE_LINK_MAX_SCORE, fetch_text, find_link, license_link_score
+from .spdx import get_spdx_licenses
 
 # API Endpoints
 URL_REPO = "https://repos.ecosyste.ms/api/v1/repositories/lookup?url="
@@ -18,19 +17,6 @@ MAX_DEPTH = 3
 # Global variable
 DEBUG_MODE = False
 
-# Load SPDX License Data to interpolate with found license files
-with open("licenses/spdx-list.json", "r") as f:
-    spdx_data = json.load(f)
-SPDX_LICENSES = {
-    entry["licenseId"].lower(): {
-        "id": entry["licenseId"],
-        "name": entry["name"], 
-        "isOsiApproved": entry.get("isOsiApproved", False),
-        "isFsfLibre": entry.get("isFsfLibre", False)
-    }
-    for entry in spdx_data["licenses"]
-}
-
 def clean_repo_url(url):
     """Removes unnecessary parts like /archive/, /releases/, and .git from repo URLs."""
     url = re.sub(r"/(archive|releases|tags|download)/.*$", "", url)
@@ -42,6 +28,8 @@ def is_valid_repo_url(url):
 
 def fetch_license_from_ecosystems(url, depth=0):
     """Fetches license information from ecosyste.ms API with a depth limit."""
+    import requests
+
     if depth > MAX_DEPTH:
             if DEBUG_MODE:
                 print(f"Max depth reached for {url}, stopping recursion.")
@@ -53,8 +41,8 @@ def fetch_license_from_ecosystems(url, depth=0):
         print(f"Depth {depth}: Checking {url}")
 
     try:
-        repo_response = requests.get(f"{URL_REPO}{formatted_url}")
-        reg_response = requests.get(f"{URL_REG}{formatted_url}")
+        repo_response = get_client().get(f"{URL_REPO}{formatted_url}", priority=PRIORITY_API)
+        reg_response = get_client().get(f"{URL_REG}{formatted_url}", priority=PRIORITY_API)
     except requests.RequestException as e:
         if DEBUG_MODE:
             print(f"Request failed: {e}")
@@ -98,47 +86,18 @@ def fetch_license_from_ecosystems(url, depth=0):
             
     return scrape_repo_from_package(clean_url, depth + 1)
 
-#def scrape_license(repo_url):
-#    try:
-#        response = requests.get(repo_url)
-#        response.raise_for_status()
-#    except requests.RequestException:
-#        return "not found"
-    
-#    soup = BeautifulSoup(response.text, "html.parser")
-#    for link in soup.find_all("a", href=True):
-#        if re.search(r"license|copying|copyright|legal", link.text, re.IGNORECASE):
-#            license_url = requests.compat.urljoin(repo_url, link["href"])
-#            license_text = requests.get(license_url).text.lower()
-#            print(str(license_text))
-#            for spdx_id, content in SPDX_LICENSES.items():
-#                print("spdx_id: "+spdx_id)
-#                print("name: "+content.get("name"))
-#                if spdx_id or content.get("name") in license_text:
-#                    return spdx_id, license_url
-#                if "GNU General Public License" in license_text: 
-#                    return "GPL-3.0", license_url
-#            return "not found", license_url
-#    return "not found"
-
 def scrape_license(repo_url):
+    import requests
+
+    # Step 1: Find the license file URL, preferring LICENSE files on the default branch
     try:
-        response = requests.get(repo_url)
-        response.raise_for_status()
+        link = find_link(repo_url, license_link_score, stop_score=LICENSE_LINK_MAX_SCORE)
     except requests.RequestException:
         return "not found"
 
-    soup = BeautifulSoup(response.text, "html.parser")
-
-    # Step 1: Find the license file URL
-    license_url = None
-    for link in soup.find_all("a", href=True):
-        if re.search(r"license|copying|copyright|legal", link.text, re.IGNORECASE):
-            license_url = requests.compat.urljoin(repo_url, link["href"])
-            break
-
-    if not license_url:
+    if not link:
         return "not found"
+    license_url = link[0]
 
     # Step 2: Handle the license file content based on the platform
     if "github.com" in repo_url:
@@ -152,12 +111,10 @@ def scrape_license(repo_url):
 
     # Step 3: Fetch and process the license file content
     try:
-        license_response = requests.get(license_url)
-        license_response.raise_for_status()
-        license_text = license_response.text.lower()
+        license_text = fetch_text(license_url).lower()
 
         # Step 4: Match the license text against SPDX licenses
-        for spdx_id, content in SPDX_LICENSES.items():
+        for spdx_id, content in get_spdx_licenses().items():
             if  content.get("name").lower() in license_text:
                 return spdx_id, license_url
         if "general public license" in license_text:
@@ -166,25 +123,28 @@ def scrape_license(repo_url):
     except requests.RequestException:
         return "not found", "not found"
 
+def repo_link_score(href, text):
+    """Score links to a GitHub/GitLab repository (any such link will do)."""
+    return 1 if is_valid_repo_url(href) else None
+
 def scrape_repo_from_package(url, depth=0):
     """Scrapes a package homepage for a GitHub/GitLab repository link."""
+    import requests
+
     if depth > MAX_DEPTH:
         if DEBUG_MODE:
             print(f"Max depth reached for {url}, stopping recursion.")
         return "not found", "not found"
 
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
+        link = find_link(url, repo_link_score, stop_score=1)
     except requests.RequestException:
         if DEBUG_MODE:
             print(f"Failed to fetch {url}")
         return "not found", "not found"
 
-    soup = BeautifulSoup(response.text, "html.parser")
-    for tag in soup.find_all("a", href=True):
-        if is_valid_repo_url(tag["href"]):
-            return fetch_license_from_ecosystems(tag["href"], depth + 1)
+    if link:
+        return fetch_license_from_ecosystems(link[1], depth + 1)
 
     return "not found", "not found"
 
@@ -198,15 +158,24 @@ def fetch_license_from_homepage_or_source(module_data):
                 return license_info, repo_url
     return "not found", "not found"
 
-def process_modules_for_licenses(modules_file):
-    """Processes module JSON file to retrieve license information."""
+def load_modules(modules_file):
+    """Loads module data (as produced by parsing_easyconfigs.process_modules) from a JSON file."""
     with open(modules_file, "r") as f:
-        modules = json.load(f)
-    
+        return json.load(f)
+
+def process_modules_for_licenses(modules, jobs=1):
+    """Processes module data to retrieve license information, using the specified number of threads."""
+    spdx_licenses = get_spdx_licenses()
+
+    if jobs > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            found_licenses = list(executor.map(fetch_license_from_homepage_or_source, modules))
+    else:
+        found_licenses = [fetch_license_from_homepage_or_source(module) for module in modules]
+
     results = {}
-    for module in modules:
+    for module, (license_info, url) in zip(modules, found_licenses):
         module_name = module["Module"]
-        license_info, url = fetch_license_from_homepage_or_source(module)
         is_redistributable = False
         
         if isinstance(license_info, tuple):
@@ -222,8 +191,8 @@ def process_modules_for_licenses(modules_file):
 
         license_info_normalized = license_info.lower() if isinstance(license_info, str) else license_info
 
-        if license_info_normalized in SPDX_LICENSES:
-            spdx_details = SPDX_LICENSES[license_info_normalized]
+        if license_info_normalized in spdx_licenses:
+            spdx_details = spdx_licenses[license_info_normalized]
             is_redistributable = spdx_details["isOsiApproved"] or spdx_details["isFsfLibre"]
 
         # Split the software name and version to display them properly in the YAML file
@@ -239,15 +208,8 @@ def process_modules_for_licenses(modules_file):
         }
     return results
 
-def save_license_results(results, output_file="licenses_aux.yaml",licenses_original = os.sys.argv[2]):
-    """Saves license information to a JSON file."""
-    with open("temporal_print.yaml", "w") as f:
-        yaml.dump(results, f, default_flow_style=False, sort_keys=True)  #Fast dump of what we have to print in the workflow
-
-    full_data = {}
-    with open(licenses_original, 'r') as f:
-        full_data = yaml.safe_load(f)
-    
+def merge_license_results(results, full_data):
+    """Adds license information for modules that are not in full_data yet, and returns full_data."""
     for software_name, versions_data in results.items():    #Look for new modules which are not in the new licenses dictionary
         if software_name not in full_data:                  #Add new modules in a data dictionary
             full_data[software_name] = {}
@@ -256,28 +218,20 @@ def save_license_results(results, output_file="licenses_aux.yaml",licenses_origi
             if version not in full_data[software_name]: 
                 full_data[software_name][version] = details         #Add/replace the details of modules found in the new licenses data dictionary
 
+    return full_data
+
+def save_license_results(results, licenses_original, output_file="licenses_aux.yaml", print_file="temporal_print.yaml"):
+    """Saves license information merged into the original licenses file to a YAML file."""
+    import yaml
+
+    with open(print_file, "w") as f:
+        yaml.dump(results, f, default_flow_style=False, sort_keys=True)  #Fast dump of what we have to print in the workflow
+
+    with open(licenses_original, 'r') as f:
+        full_data = yaml.safe_load(f) or {}
+
+    full_data = merge_license_results(results, full_data)
+
     with open(output_file, "w") as f:
         yaml.dump(full_data, f, default_flow_style=False, sort_keys=True)  #Export data dictionary as licenses_aux.yaml file
     print(f"License information saved to {output_file}")    
-
-def parse_arguments():
-        parser = argparse.ArgumentParser(description='Script to parse licenses')
-        parser.add_argument('input_file', help='Path to the input file')
-        parser.add_argument('licenses_original', help='Path to the original licenses file (licenses.yml)')
-        parser.add_argument('--debug', help='Prints scripts debugging', action='store_true', required=False)
-        return parser.parse_args()
-
-def main():
-    modules_file = "modules_results.json"
-    if not os.path.exists(modules_file):
-        print(f"Error: {modules_file} not found.")
-        return
-    license_results = process_modules_for_licenses(modules_file)
-    save_license_results(license_results)
-
-if __name__ == "__main__":
-    # Parse command-line arguments and enable global debug mode if requested
-    args = parse_arguments()
-    if args.debug:
-        DEBUG_MODE = True
-    main()
@@ -1,7 +1,7 @@
-import os
 import re
-import requests
-import json
+from concurrent.futures import ThreadPoolExecutor
+
+from .http_client import PRIORITY_EASYCONFIG, get_client
 
 
 def get_easyconfig_filename(module_name):
@@ -19,8 +19,10 @@ def get_easyconfig_url(module_name):
 
 def extract_homepage_or_source(easyconfig_url, module_name):
     """Fetches the EasyConfig file and extracts the homepage or source URL."""
+    import requests
+
     try:
-        response = requests.get(easyconfig_url)
+        response = get_client().get(easyconfig_url, priority=PRIORITY_EASYCONFIG)
         response.raise_for_status()
         content = response.text
 
@@ -57,49 +59,29 @@ def extract_homepage_or_source(easyconfig_url, module_name):
         return "N/A", "N/A"
 
 
-def process_modules(module_list):
-    """Processes a list of modules to retrieve homepage and source URLs."""
-    results = []
+def process_module(module):
+    """Retrieves homepage and source URL for a single module."""
+    easyconfig_url = get_easyconfig_url(module)
+    homepage, source_url = extract_homepage_or_source(easyconfig_url, module)
+
+    return {
+        "Module": module,
+        "EasyConfig URL": easyconfig_url,
+        "Homepage": homepage,
+        "Source URL": source_url
+    }
 
-    for module in module_list:
-        easyconfig_url = get_easyconfig_url(module)
-        homepage, source_url = extract_homepage_or_source(easyconfig_url, module)
 
-        results.append({
-            "Module": module,
-            "EasyConfig URL": easyconfig_url,
-            "Homepage": homepage,
-            "Source URL": source_url
-        })
+def process_modules(module_list, jobs=1):
+    """Processes a list of modules to retrieve homepage and source URLs, using the specified number of threads."""
+    if jobs > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(process_module, module_list))
 
-    return results
+    return [process_module(module) for module in module_list]
 
 
 def load_modules_from_file(filename):
     """Loads module names from a text file."""
     with open(filename, "r") as f:
         return [line.strip() for line in f if line.strip()]
-
-
-def main():
-    
-    filename = os.sys.argv[1] if len(os.sys.argv) > 1 else "missing_modules.txt"  # Default filename
-
-    if not os.path.exists(filename):
-        print(f"Error: {filename} not found.")
-        return
-
-    module_list = load_modules_from_file(filename)
-    results = process_modules(module_list)
-
-    # Save results to a JSON file
-    output_file = "modules_results.json"  # Output file to store results
-
-    with open(output_file, "w") as f:
-        json.dump(results, f, indent=4)
-
-    print(f"Results saved to {output_file}")
-
-
-if __name__ == "__main__":
-    main()
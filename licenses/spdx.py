@@ -1,45 +1,80 @@
 import json
 import logging
-import sys
-import urllib.request
+import os
 
 SPDX_LICENSE_LIST_URL = 'https://raw.githubusercontent.com/spdx/license-list-data/main/json/licenses.json'
+SPDX_LICENSE_LIST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'spdx-list.json')
 
 LICENSE_URL = 'license_url'
 SPDX = 'spdx'
 
 spdx_license_list = None
+spdx_licenses_by_id = None
 
-# Configure the logging module
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
 
 
-def get_spdx_license_list():
+def download_spdx_license_list():
     """
     Download JSON file with current list of SPDX licenses, parse it, and return it as a Python dictionary.
     """
-    global spdx_license_list
+    import urllib.request
 
-    if spdx_license_list is None:
-        with urllib.request.urlopen(SPDX_LICENSE_LIST_URL) as fp:
-            spdx_license_list = json.load(fp)
-        version, release_date = spdx_license_list['licenseListVersion'], spdx_license_list['releaseDate']
-        logging.info(f"Downloaded version {version} of SPDX license list (release date: {release_date})")
+    with urllib.request.urlopen(SPDX_LICENSE_LIST_URL) as fp:
+        data = json.load(fp)
+    version, release_date = data['licenseListVersion'], data['releaseDate']
+    logger.info(f"Downloaded version {version} of SPDX license list (release date: {release_date})")
+    return data
+
+
+def get_spdx_license_list(online=False):
+    """
+    Return the list of SPDX licenses as a Python dictionary, loading it on first use.
+
+    By default the copy shipped next to this module (spdx-list.json) is used;
+    with online=True the current list is downloaded from the SPDX project instead.
+    """
+    global spdx_license_list, spdx_licenses_by_id
+
+    if spdx_license_list is None or online:
+        if online:
+            spdx_license_list = download_spdx_license_list()
+        else:
+            with open(SPDX_LICENSE_LIST_PATH) as fp:
+                spdx_license_list = json.load(fp)
+        spdx_licenses_by_id = None
         licenses = spdx_license_list['licenses']
-        logging.info(f"Found info on {len(licenses)} licenses!")
+        logger.info(f"Found info on {len(licenses)} licenses!")
 
     return spdx_license_list
 
 
+def get_spdx_licenses():
+    """
+    Return mapping of lowercase SPDX identifiers to license details (id, name, OSI/FSF status).
+    """
+    global spdx_licenses_by_id
+
+    if spdx_licenses_by_id is None:
+        spdx_licenses_by_id = {
+            entry["licenseId"].lower(): {
+                "id": entry["licenseId"],
+                "name": entry["name"],
+                "isOsiApproved": entry.get("isOsiApproved", False),
+                "isFsfLibre": entry.get("isFsfLibre", False)
+            }
+            for entry in get_spdx_license_list()["licenses"]
+        }
+
+    return spdx_licenses_by_id
+
+
 def license_info(spdx_id):
     """Find license with specified SPDX identifier."""
- 
-    spdx_license_list = get_spdx_license_list()
 
-    licenses = spdx_license_list['licenses']
-    for lic in licenses:
-        if lic['licenseId'] == spdx_id:
-            return lic
+    lic = get_spdx_licenses().get(spdx_id.lower()) if isinstance(spdx_id, str) else None
+    if lic and lic['id'] == spdx_id:
+        return lic
 
     # if no match is found, return None as result
     return None
@@ -66,35 +101,16 @@ def check_licenses(licenses):
         lic_info = license_info(spdx_lic_id)
         if lic_info:
             lic_url = licenses[software_name][LICENSE_URL]
-            logging.info(f"License for software '{software_name}': {lic_info['name']} (see {lic_url})")
+            logger.info(f"License for software '{software_name}': {lic_info['name']} (see {lic_url})")
         else:
-            logging.warning(f"Found faulty SPDX license ID for {software_name}: {spdx_lic_id}")
+            logger.warning(f"Found faulty SPDX license ID for {software_name}: {spdx_lic_id}")
             faulty_licenses[software_name] = spdx_lic_id
 
     if faulty_licenses:
-        logging.warning(f"Found {len(faulty_licenses)} faulty SPDIX license IDs (out of {len(licenses)})!")
+        logger.warning(f"Found {len(faulty_licenses)} faulty SPDX license IDs (out of {len(licenses)})!")
         result = False
     else:
-        logging.info(f"License check passed for {len(licenses)} licenses!")
+        logger.info(f"License check passed for {len(licenses)} licenses!")
         result = True
 
     return result
-
-
-def main(args):
-    if len(args) == 1:
-        licenses_path = args[0]
-    else:
-        logging.error("Usage: python spdx.py <path to licenses.json>")
-        sys.exit(1)
-
-    licenses = read_licenses(licenses_path)
-    if check_licenses(licenses):
-        logging.info("All license checks PASSED!")
-    else:
-        logging.error("One or more licence checks failed!")
-        sys.exit(2)
-
-
-if __name__ == '__main__':
-    main(sys.argv[1:])
@@ -1,15 +1,20 @@
-import requests
 import argparse
 import json
 import os
 import re
-from datetime import datetime
+from datetime import datetime, timezone
+
+from . import history
+from .http_client import get_client
 
 url_repo = "https://repos.ecosyste.ms/api/v1/hosts"    
 url_reg = "https://packages.ecosyste.ms/api/v1/registries"
 
+# license value returned by the ecosyste.ms lookups when no license could be retrieved
+NOT_FOUND = history.NOT_FOUND
+
 def ecosystems_list(url): 
-    r = requests.get(url)
+    r = get_client().get(url)
     if r.status_code != 200:
         return "not found", None, None
     data = r.json()
@@ -36,38 +41,39 @@ def validate_repo_format(value):
     
     return value  # Return the validated string
 
-def parse_arguments(): 
-    
-    # Positional arguments
-    parser = argparse.ArgumentParser(description='Script to ingest licenses')
-    parser.add_argument('project', nargs='+', help='List of project name')
-    parser.add_argument(
-        '--manual', help='Manually provided license', required=False)
-    parser.add_argument(
-        '--spdx', help='SPDX identifier for the license', required=False)
-    
-    # Now the complicated ones
-    group = parser.add_mutually_exclusive_group()
-    group.add_argument('--registry', help='Origin registry. Use "--registry help" to see all available options', metavar='REGISTRY', choices=ecosystems_list(url_reg))
-    group.add_argument('--repo', help='Origin repository. Format: <host>:<user>/<repo>. All available hosts shown with "--repo help"', metavar='REPOSITORY', type=validate_repo_format)
+def validate_registry(value):
+    # Ensures the registry is known to ecosyste.ms; only queried when --registry is actually used.
+    import requests
+
+    try:
+        registries = ecosystems_list(url_reg)
+    except requests.RequestException:
+        registries = None
+    if not isinstance(registries, list):
+        raise argparse.ArgumentTypeError(
+            f"Failed to retrieve list of registries from {url_reg}"
+        )
+
+    if value not in registries:
+        intro = "Available registries" if value == 'help' else f"Invalid registry '{value}'. Available registries"
+        raise argparse.ArgumentTypeError(
+            f"{intro}: {', '.join(sorted(registries))}"
+        )
 
-    args = parser.parse_args()
-    return args
+    return value
 
 # Retrieve license from  ecosyste.ms package API
 def ecosystems_packages(registry, package):
-    print("available registries: ")
-    ecosystems_registries()
     url = "https://packages.ecosyste.ms/api/v1/registries/{registry}/packages/{package}".format(
         registry=registry, package=package
     )
     print(url)
-    r = requests.get(url)
+    r = get_client().get(url)
     if r.status_code != 200:
-        return "not found", None, None
+        return NOT_FOUND, registry
     data = r.json()
     print(data.get('licenses'))
-    return data.get('normalized_licenses', 'not found'), registry 
+    return data.get('normalized_licenses') or NOT_FOUND, registry
 
 # Retrieve license from ecosyste.ms repo API 
 def ecosystems_repo(repository, source):
@@ -81,50 +87,42 @@ def ecosystems_repo(repository, source):
         url = "https://repos.ecosyste.ms/api/v1/hosts/{hostname}/repositories/{user}%2F{repo}".format(
         hostname=hostname, user=user, repo=repo)
     print(url)
-    r = requests.get(url)
+    r = get_client().get(url)
     if r.status_code != 200:
-        return "not found", None, None
+        return NOT_FOUND
     data = r.json()
-    return data.get('license', 'not found')
+    return data.get('license') or NOT_FOUND
 
 # Main license retrieval function
-def go_fetch(args):
+def go_fetch(args, project):
     if args.registry:
-        lic, source = ecosystems_packages(args.registry, args.project)
+        lic, source = ecosystems_packages(args.registry, project)
     elif args.repo:
-        lic = ecosystems_repo(args.repo, args.project)
+        lic = ecosystems_repo(args.repo, project)
+        source = args.repo
     else:
-        lic, source, url = "not found", None, None
-        spdx_id = args.spdx if args.spdx else (
-        lic if lic and lic != "not found" else None)
+        lic, source = NOT_FOUND, None
 
     info = {
         "license": lic,
-#        "source": source,
-        "retrieved_at": datetime.now().isoformat(),
+        "source": source,
+        "retrieved_at": datetime.now(timezone.utc).isoformat(),
     }
     return info
 
 
 def update_json(licenses, project, info):
     if project in licenses:
-        if 'history' not in licenses[project]:
-            licenses[project]['history'] = []
-        licenses[project]['history'].append(info)
-        licenses[project]['current'] = info
-        print('Updated license for project {project}'.format(project=project))
+        if history.record(licenses[project], info):
+            print('Updated license for project {project}'.format(project=project))
+        else:
+            print('License for project {project} unchanged'.format(project=project))
     else:
-        licenses[project] = {
-            "current": info,
-            "history": [info],
-        }
+        licenses[project] = {}
+        history.record(licenses[project], info)
         print('Added new license for project {project}'.format(
             project=project))
 
-    lic_json = json.dumps(licenses, indent=4)
-    with open('licenses.json', 'w') as lic_file:
-        lic_file.write(lic_json)
-
     return licenses
 
 # Create patch output
@@ -143,37 +141,43 @@ def save_patch(patch_content, filename="license_update.patch"):
     print("Patch saved to {filename}".format(filename=filename))
 
 
-def main():
-    args = parse_arguments()
+def load_licenses(path='licenses.json'):
+    if os.path.exists(path):
+        with open(path, 'r') as lic_dict:
+            # also compacts history of files written before only license changes were recorded
+            return history.compact(json.loads(lic_dict.read()))
+    return {}
 
-    if os.path.exists('licenses.json'):
-        with open('licenses.json', 'r') as lic_dict:
-            licenses = json.loads(lic_dict.read())
-    else:
-        licenses = {}
+
+def run(args, licenses=None, path='licenses.json'):
+    if licenses is None:
+        licenses = load_licenses(path)
 
     for project in args.project:
         # add if not manual, this just for fetching the license!
         if not args.manual:
             # we fetchin'
-            info = go_fetch(args)
+            info = go_fetch(args, project)
+            if history.is_failed_lookup(info["license"]):
+                # a failed lookup is not a license change, keep the history as it is
+                print('Failed to retrieve license for project {project}, not updated'.format(project=project))
+                continue
             update_json(licenses, project, info)
         else: 
             # we inserting it manually
             info = {
                 "license": args.spdx,
-                "retrieved_at": datetime.now().isoformat(),
+                "source": "manual",
+                "retrieved_at": datetime.now(timezone.utc).isoformat(),
             }
+            update_json(licenses, project, info)
 	
 
     patch = generate_patch(licenses)
     save_patch(patch)
 
-    with open('licenses.json', 'w') as lic_file:
+    with open(path, 'w') as lic_file:
         lic_file.write(patch)
 
     print("Patch output:\n{patch}".format(patch=patch))
-
-
-if __name__ == "__main__":
-    main()
+    return licenses